@@ -0,0 +1,537 @@
+"""
+Shared playback core for ``mkv_player.py`` and ``mkv_player_v2.py``.
+
+Both scripts are thin command-line front ends around :class:`Player`, which
+decodes the video on a background thread, shows frames on a wall-clock
+schedule in an OpenCV window, optionally overlays subtitles from a
+:class:`SubtitleIndex` and saves subtitle-free screenshots in the background.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+if TYPE_CHECKING:
+    import av
+
+
+# One SRT cue: an optional index line, the "HH:MM:SS,mmm --> HH:MM:SS,mmm"
+# timing line (one group per field) and the following non-blank text lines.
+# Anything that does not fit this shape is skipped as malformed.
+CUE_RE = re.compile(
+    r"^[ \t]*(?:\d+[ \t\r]*\n[ \t]*)?"
+    r"(\d+):(\d+):(\d+),(\d+)[ \t]*-->[ \t]*(\d+):(\d+):(\d+),(\d+)[^\n]*(?:\n|\Z)"
+    r"((?:[ \t\r]*\S[^\n]*(?:\n|\Z))*)",
+    re.MULTILINE,
+)
+
+
+def timecodes_to_seconds(fields: np.ndarray) -> np.ndarray:
+    """Convert an (N, 4) array of hours, minutes, seconds, milliseconds into seconds."""
+    return fields[:, 0] * 3600.0 + fields[:, 1] * 60.0 + fields[:, 2] + fields[:, 3] / 1000.0
+
+
+def cue_cursor(starts: np.ndarray, current_time: float) -> int:
+    """Return the index of the last cue starting at or before ``current_time``, or -1."""
+    return int(np.searchsorted(starts, current_time, side="right")) - 1
+
+
+class SubtitleIndex:
+    """Subtitle cues stored as parallel arrays with a cursor for playback.
+
+    ``starts`` and ``ends`` are float64 arrays of cue times in seconds, sorted
+    by start time, and ``lines[i]`` holds the text lines of cue ``i``.  During
+    normal playback the active cue changes only a few times per second, so
+    :meth:`lookup` remembers the last cue it found and only steps forward from
+    there.  A jump backwards or further than ``SEEK_THRESHOLD`` seconds is
+    treated as a seek and resolved with a binary search.  Each lookup also
+    records the next time at which the answer can change (the active cue's
+    end or the next cue's start); until then the previous result is returned
+    without touching the cue arrays at all.
+    """
+
+    SEEK_THRESHOLD = 1.0
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, lines: List[List[str]]) -> None:
+        self.starts = starts
+        self.ends = ends
+        self.lines = lines
+        # Index of the last cue starting at or before the previous lookup time
+        self.cursor = -1
+        self._last_time = 0.0
+        # Result of the previous lookup, valid for _last_time <= t < _next_change
+        self._active: Optional[List[str]] = None
+        self._next_change = 0.0
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def lookup(self, current_time: float) -> Optional[List[str]]:
+        """Return the text lines for the active subtitle at the given time, or None."""
+        if self._last_time <= current_time < self._next_change:
+            self._last_time = current_time
+            return self._active
+        starts = self.starts
+        cursor = self.cursor
+        if current_time < self._last_time or current_time - self._last_time > self.SEEK_THRESHOLD:
+            # Last cue starting at or before current_time; overlapping cues
+            # are not considered, matching how SRT files are normally authored.
+            cursor = cue_cursor(starts, current_time)
+        else:
+            while cursor + 1 < len(starts) and starts[cursor + 1] <= current_time:
+                cursor += 1
+        self.cursor = cursor
+        self._last_time = current_time
+        next_start = float(starts[cursor + 1]) if cursor + 1 < len(starts) else float("inf")
+        if cursor >= 0 and self.ends[cursor] >= current_time:
+            self._active = self.lines[cursor]
+            self._next_change = min(float(self.ends[cursor]), next_start)
+        else:
+            self._active = None
+            self._next_change = next_start
+        return self._active
+
+
+def parse_srt(path: str) -> SubtitleIndex:
+    """Parse a SubRip (.srt) subtitle file into a :class:`SubtitleIndex`.
+
+    Times are in seconds.  Text lines preserve their order and may contain
+    multiple lines.
+    """
+    texts: List[List[str]] = []
+    if not os.path.exists(path):
+        print(f"Subtitle file '{path}' does not exist. Continuing without subtitles.")
+        return SubtitleIndex(np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64), texts)
+    # utf-8-sig drops a leading BOM that would otherwise hide the first index
+    with open(path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        content = f.read()
+
+    # Match every cue in one pass over the text, then convert all timings at once
+    timings: List[Tuple[str, ...]] = []
+    for match in CUE_RE.finditer(content):
+        timings.append(match.groups()[:8])
+        texts.append(match.group(9).splitlines())
+
+    fields = np.asarray(timings, dtype=np.str_).astype(np.int64).reshape(-1, 8)
+    start_arr = timecodes_to_seconds(fields[:, :4])
+    end_arr = timecodes_to_seconds(fields[:, 4:])
+    # Binary search requires sorted start times; most files already are, but
+    # a stable sort keeps the original order for cues sharing a start time.
+    order = np.argsort(start_arr, kind="stable")
+    if np.any(order != np.arange(len(order))):
+        start_arr = start_arr[order]
+        end_arr = end_arr[order]
+        texts = [texts[i] for i in order]
+    return SubtitleIndex(start_arr, end_arr, texts)
+
+
+# Subtitle font settings
+SUBTITLE_FONT = cv2.FONT_HERSHEY_SIMPLEX
+SUBTITLE_FONT_SCALE = 0.6  # relative size; adjust as needed
+SUBTITLE_THICKNESS = 2
+
+
+@lru_cache(maxsize=4096)
+def text_size(line: str) -> Tuple[int, int]:
+    """Return the (width, height) of a subtitle line, cached per string."""
+    (width, height), _ = cv2.getTextSize(line, SUBTITLE_FONT, SUBTITLE_FONT_SCALE, SUBTITLE_THICKNESS)
+    return width, height
+
+
+@lru_cache(maxsize=256)
+def render_cue_sprite(lines: Tuple[str, ...], frame_w: int) -> Tuple[np.ndarray, np.ndarray, int, int]:
+    """Rasterize a subtitle cue once into a bottom-of-frame overlay sprite.
+
+    Returns ``(sprite, keep, x, height)``.  The sprite covers the columns of
+    the background box starting at ``x`` and the bottom ``height`` rows of
+    the frame; nothing outside it changes.  ``sprite`` holds the
+    premultiplied text colour and ``keep`` the per-pixel weight (scaled to
+    0-255) of the underlying frame, so blending is ``frame * keep / 255 +
+    sprite``.  This reproduces the semi‑transparent box with anti-aliased
+    white text while paying for ``getTextSize``/``putText`` only once per cue
+    rather than on every frame it is shown.  Results are cached, so callers
+    must not modify the returned arrays.
+    """
+    line_spacing = 10  # pixels between lines
+    margin_bottom = 20  # distance from bottom of frame
+    alpha = 0.5  # opacity of the background box
+
+    # Determine size of each line
+    text_sizes = [text_size(line) for line in lines]
+    max_width = max(size[0] for size in text_sizes)
+    total_text_height = sum(size[1] for size in text_sizes) + (len(lines) - 1) * line_spacing
+
+    # The sprite starts at the top edge of the box and runs to the bottom of
+    # the frame so that descenders below the box are kept.
+    height = 5 + total_text_height + margin_bottom
+    x_start = (frame_w - max_width) // 2
+
+    box = np.zeros((height, frame_w), dtype=np.uint8)
+    cv2.rectangle(box, (x_start - 10, 0), (x_start + max_width + 10, total_text_height + 10), 255, -1)
+
+    text = np.zeros((height, frame_w), dtype=np.uint8)
+    y = 5
+    for line, size in zip(lines, text_sizes):
+        line_width, line_height = size
+        x = (frame_w - line_width) // 2
+        cv2.putText(text, line, (x, y + line_height), SUBTITLE_FONT, SUBTITLE_FONT_SCALE, 255,
+                    SUBTITLE_THICKNESS, cv2.LINE_AA)
+        y += line_height + line_spacing
+
+    # Darkening by the box followed by drawing white text with coverage c
+    # leaves frame * (1 - alpha * box) * (1 - c) + 255 * c.
+    coverage = text.astype(np.float32) / 255.0
+    keep = (1.0 - alpha * (box.astype(np.float32) / 255.0)) * (1.0 - coverage)
+    keep_u8 = np.rint(keep * 255.0).astype(np.uint8)
+
+    # Crop to the box columns (clipped to the frame) so blending only walks
+    # the pixels that actually change
+    x1 = max(0, x_start - 10)
+    x2 = min(frame_w, x_start + max_width + 11)
+    text = text[:, x1:x2]
+    keep_u8 = keep_u8[:, x1:x2]
+    return cv2.merge([text, text, text]), cv2.merge([keep_u8, keep_u8, keep_u8]), x1, height
+
+
+def blend_sprite(roi: np.ndarray, keep: np.ndarray, sprite: np.ndarray) -> None:
+    """Blend a subtitle sprite into ``roi`` in place as ``roi * keep / 255 + sprite``."""
+    cv2.multiply(roi, keep, dst=roi, scale=1.0 / 255.0)
+    cv2.add(roi, sprite, dst=roi)
+
+
+def overlay_subtitle(frame: np.ndarray, lines: List[str], dst: Optional[np.ndarray] = None) -> np.ndarray:
+    """Overlay subtitle lines onto a frame and return the result.
+
+    The subtitle is drawn at the bottom of the frame.  A semi‑transparent
+    rectangle is drawn behind the text to improve readability.  If ``dst``
+    is given, the frame is first copied into it (it must have the same shape
+    and type) and the subtitle is drawn there, leaving ``frame`` untouched;
+    this lets callers reuse one buffer instead of allocating a copy per
+    frame.  Without ``dst`` the frame itself is modified in place.
+    """
+    if dst is not None:
+        np.copyto(dst, frame)
+        frame = dst
+    h, w = frame.shape[:2]
+    if not lines:
+        return frame
+
+    sprite, keep, x0, height = render_cue_sprite(tuple(lines), w)
+    # Clip the sprite if the frame is shorter than the subtitle block
+    y0 = max(0, h - height)
+    sprite = sprite[height - (h - y0):]
+    keep = keep[height - (h - y0):]
+    # Darken and composite the text over the box ROI only; OpenCV writes
+    # straight into the strided view
+    roi = frame[y0:h, x0:x0 + sprite.shape[1]]
+    blend_sprite(roi, keep, sprite)
+    return frame
+
+
+def cuda_available() -> bool:
+    """Return True if OpenCV was built with CUDA and a CUDA device is present."""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+
+@lru_cache(maxsize=256)
+def gpu_cue_sprite(lines: Tuple[str, ...], frame_w: int) -> Tuple["cv2.cuda_GpuMat", "cv2.cuda_GpuMat", int, int]:
+    """Upload the sprite from :func:`render_cue_sprite` to the GPU once per cue."""
+    sprite, keep, x0, height = render_cue_sprite(lines, frame_w)
+    gpu_sprite = cv2.cuda_GpuMat()
+    gpu_sprite.upload(sprite)
+    gpu_keep = cv2.cuda_GpuMat()
+    gpu_keep.upload(keep)
+    return gpu_sprite, gpu_keep, x0, height
+
+
+def overlay_subtitle_gpu(frame: np.ndarray, lines: List[str], gpu_roi: "cv2.cuda_GpuMat",
+                         dst: np.ndarray) -> np.ndarray:
+    """CUDA variant of :func:`overlay_subtitle`.
+
+    The frame is copied into ``dst`` on the host.  Only the subtitle box is
+    uploaded into ``gpu_roi``, blended with the cached sprite on the device
+    and downloaded back into the same region of ``dst``.  ``frame`` itself
+    is left untouched.
+    """
+    np.copyto(dst, frame)
+    h, w = dst.shape[:2]
+    if not lines:
+        return dst
+    gpu_sprite, gpu_keep, x0, height = gpu_cue_sprite(tuple(lines), w)
+    if height > h:
+        # Clipping is only handled by the CPU path
+        return overlay_subtitle(dst, lines)
+    sprite_w, _ = gpu_sprite.size()
+    roi = dst[h - height:h, x0:x0 + sprite_w]
+    gpu_roi.upload(roi)
+    cv2.cuda.multiply(gpu_roi, gpu_keep, dst=gpu_roi, scale=1.0 / 255.0)
+    cv2.cuda.add(gpu_roi, gpu_sprite, dst=gpu_roi)
+    # Download into a compact array; the strided slice cannot be a cv2 output
+    np.copyto(roi, gpu_roi.download())
+    return dst
+
+
+# Frame rate assumed when the container does not report one
+DEFAULT_FPS = 25
+# Number of decoded frames the reader thread may queue ahead of the display
+PREFETCH_FRAMES = 8
+
+# A decoded BGR frame and its position in the video in seconds
+TimedFrame = Tuple[np.ndarray, float]
+
+
+def capture_frames(cap: cv2.VideoCapture) -> Iterator[TimedFrame]:
+    """Yield ``(frame, position)`` pairs decoded by an OpenCV capture."""
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield frame, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+
+def av_frames(container: "av.container.InputContainer", stream: "av.video.stream.VideoStream",
+              fps: float) -> Iterator[TimedFrame]:
+    """Yield ``(frame, position)`` pairs decoded by PyAV."""
+    for index, frame in enumerate(container.decode(stream)):
+        # Fall back to the frame count if the frame carries no timestamp
+        position = frame.time if frame.time is not None else index / (fps or DEFAULT_FPS)
+        yield frame.to_ndarray(format="bgr24"), position
+
+
+def open_video(video_path: str) -> Optional[Tuple[Iterator[TimedFrame], float, Callable[[], None]]]:
+    """Open ``video_path`` for decoding.
+
+    Returns ``(frames, fps, close)``: an iterator of decoded frames, the
+    nominal frame rate (0 if unknown) and a callable that releases the
+    decoder.  Returns None if the video cannot be opened.  PyAV is preferred
+    when installed since it exposes FFmpeg's multi-threaded decoding
+    directly; otherwise OpenCV's ``VideoCapture`` is used.
+    """
+    # Imported here so that importing this module stays as cheap as cv2 and
+    # NumPy; PyAV is only loaded once a video is actually opened.
+    try:
+        import av
+    except ImportError:  # PyAV is optional
+        av = None
+    if av is not None:
+        try:
+            container = av.open(video_path)
+        except av.error.FFmpegError as exc:
+            print(f"PyAV could not open '{video_path}' ({exc}); falling back to OpenCV.")
+        else:
+            if container.streams.video:
+                stream = container.streams.video[0]
+                stream.thread_type = "AUTO"
+                fps = float(stream.average_rate) if stream.average_rate else 0.0
+                return av_frames(container, stream, fps), fps, container.close
+            container.close()
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    return capture_frames(cap), cap.get(cv2.CAP_PROP_FPS), cap.release
+
+
+def read_frames(source: Iterator[TimedFrame], frames: "queue.Queue[Optional[TimedFrame]]",
+                stop: threading.Event) -> None:
+    """Move frames from ``source`` into ``frames`` until the video ends or ``stop`` is set.
+
+    Meant to run on a background thread so decoding overlaps with display.
+    ``None`` is queued last to mark the end of the video.  The bounded queue
+    makes the reader wait while playback is paused.
+    """
+
+    def put(item: Optional[TimedFrame]) -> bool:
+        # Block on a full queue but keep checking for shutdown
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        for item in source:
+            if not put(item):
+                break
+    finally:
+        put(None)
+
+
+# Fast deflate level: much quicker than OpenCV's default for a modest size cost
+SCREENSHOT_PNG_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+
+def save_screenshot(filepath: str, frame: np.ndarray) -> None:
+    """Encode ``frame`` as PNG and write it to ``filepath``.
+
+    Runs on the screenshot worker pool so the slow PNG encode does not stall
+    playback.  Encoding into memory first keeps the whole encode inside
+    OpenCV (which releases the GIL) and leaves a single buffered write.
+    """
+    ok, buf = cv2.imencode(".png", frame, SCREENSHOT_PNG_PARAMS)
+    if not ok:
+        print(f"Error: could not encode screenshot for '{filepath}'.")
+        return
+    try:
+        with open(filepath, "wb") as f:
+            f.write(buf)
+    except OSError as exc:
+        print(f"Error: could not save screenshot to '{filepath}': {exc}")
+        return
+    print(f"Saved screenshot to {filepath}")
+
+
+class Player:
+    """Play a video in an OpenCV window with an optional subtitle overlay.
+
+    ``subtitles`` are drawn over the displayed frame only, so screenshots
+    saved to ``output_dir`` with the **s** key never contain them.  With
+    ``use_gpu`` the subtitles are blended on a CUDA device when OpenCV
+    supports it.
+    """
+
+    window_name = "MKV Player"
+
+    def __init__(self, video_path: str, subtitles: Optional[SubtitleIndex] = None,
+                 output_dir: str = "screenshots", use_gpu: bool = False) -> None:
+        self.video_path = video_path
+        self.subtitles = subtitles
+        self.output_dir = output_dir
+        self.use_gpu = use_gpu
+        # Subtitled frames are composed here; imshow copies the image, so one
+        # buffer can be reused for every frame
+        self._display_buffer: Optional[np.ndarray] = None
+        # Device buffer for the subtitle box on the CUDA overlay path
+        self._gpu_roi: Optional["cv2.cuda_GpuMat"] = None
+        # Screenshots are encoded and written in the background
+        self._screenshot_pool: Optional[ThreadPoolExecutor] = None
+        # Appended to filenames so screenshots taken in a burst never collide
+        self._screenshot_count = 0
+
+    def _compose(self, frame: np.ndarray, current_time: float) -> np.ndarray:
+        """Return the frame to display, with the active subtitle (if any) drawn on it."""
+        if self.subtitles is None:
+            return frame
+        subtitle_lines = self.subtitles.lookup(current_time)
+        if not subtitle_lines:
+            return frame
+        # Draw into the reusable buffer so the frame used for screenshots
+        # never carries the overlay
+        if self._display_buffer is None or self._display_buffer.shape != frame.shape:
+            self._display_buffer = np.empty_like(frame)
+        if self._gpu_roi is not None:
+            return overlay_subtitle_gpu(frame, subtitle_lines, self._gpu_roi, self._display_buffer)
+        return overlay_subtitle(frame, subtitle_lines, dst=self._display_buffer)
+
+    def _take_screenshot(self, frame: np.ndarray) -> None:
+        """Queue ``frame`` to be saved as a PNG in the output directory."""
+        self._screenshot_count += 1
+        filename = f"screenshot_{time.time_ns()}_{self._screenshot_count}.png"
+        filepath = os.path.join(self.output_dir, filename)
+        # Decoded frames are never drawn on, so no copy is needed
+        self._screenshot_pool.submit(save_screenshot, filepath, frame)
+
+    def run(self) -> None:
+        """Play the video until it ends or the user quits.
+
+        Raises OSError if the video cannot be opened.
+        """
+        # Create output directory if it doesn't exist
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        # Open the video, preferring PyAV's multi-threaded decoder
+        opened = open_video(self.video_path)
+        if opened is None:
+            raise OSError(f"could not open video file '{self.video_path}'")
+        source, fps, close_video = opened
+
+        # Use the frame rate to control playback speed
+        if fps <= 0:
+            fps = DEFAULT_FPS
+        delay = int(1000 / fps)
+        frame_interval = 1.0 / fps
+
+        if self.use_gpu:
+            if cuda_available():
+                self._gpu_roi = cv2.cuda_GpuMat()
+            else:
+                print("CUDA is not available in this OpenCV build; blending subtitles on the CPU.")
+
+        paused = False
+        current_frame: Optional[np.ndarray] = None
+        current_time = 0.0
+        cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+
+        print("Controls: press 'space' to pause/resume, 's' to take a screenshot, 'q' or Esc to quit.")
+
+        # Decode on a background thread; the decoder is only touched there
+        frames: "queue.Queue[Optional[TimedFrame]]" = queue.Queue(maxsize=PREFETCH_FRAMES)
+        stop = threading.Event()
+        reader = threading.Thread(target=read_frames, args=(source, frames, stop), daemon=True)
+        reader.start()
+        self._screenshot_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Playback clock: frame n is due on screen at clock_start + n * frame_interval.
+        # Deriving each deadline from the origin keeps overlay and display time
+        # from accumulating into drift.
+        clock_start = time.perf_counter()
+        frame_index = 0
+        next_due = clock_start
+        while True:
+            if not paused:
+                item = frames.get()
+                if item is None:
+                    print("End of video.")
+                    break
+                frame_index += 1
+                next_due = clock_start + frame_index * frame_interval
+                # Drop frames whose display slot has already passed, as long as a
+                # newer frame is ready to take their place
+                if current_frame is not None and time.perf_counter() > next_due and not frames.empty():
+                    continue
+                current_frame, current_time = item
+            # Use the last read frame if paused
+            if current_frame is None:
+                break
+            # Show frame
+            cv2.imshow(self.window_name, self._compose(current_frame, current_time))
+            # Wait for key press and timing; waitKey returns key code or -1
+            if paused:
+                wait_ms = delay
+            else:
+                # Sleep only for what is left of this frame's slot
+                wait_ms = max(1, int((next_due - time.perf_counter()) * 1000))
+            key = cv2.waitKey(wait_ms) & 0xFF
+            if key in (ord('q'), 27):
+                # Quit on 'q' or Escape
+                print("Quitting...")
+                break
+            elif key == ord(' '):
+                paused = not paused
+                if not paused:
+                    # Restart the playback clock so paused time is not made up
+                    clock_start = time.perf_counter()
+                    frame_index = 0
+            elif key == ord('s'):
+                # Save current_frame without subtitles
+                self._take_screenshot(current_frame)
+            # else ignore other keys
+
+        # Cleanup
+        stop.set()
+        reader.join()
+        self._screenshot_pool.shutdown(wait=True)
+        close_video()
+        cv2.destroyAllWindows()
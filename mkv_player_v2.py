@@ -20,6 +20,8 @@ Python distribution:
 
 * OpenCV (`cv2`) for video decoding and display.
 * NumPy for array manipulations (comes bundled with OpenCV on many platforms).
+* PyAV (optional) for faster multi-threaded FFmpeg decoding; OpenCV's
+  `VideoCapture` is used without it.
 
 Neither `python‑vlc` nor a GUI toolkit such as Tkinter are required.  Audio
 playback is not implemented because it would add additional dependencies.  The
@@ -53,23 +55,21 @@ After extracting a frame, it can be shown with `imshow()` and `waitKey()` can
 pause execution to handle user input; when the window is closed
 `destroyAllWindows()` and `cap.release()` free resources【5417716936850†L270-L274】.
 When the user requests a screenshot, the program simply writes the raw
-current frame to disk using `cv2.imwrite`; because no subtitles are rendered
+current frame to disk using `cv2.imencode`; because no subtitles are rendered
 by OpenCV, the captured image contains only the video【47430801850246†L185-L188】.
 If you were using the MPV media player, pressing **S** takes a screenshot
 without subtitles whereas **s** includes them【47430801850246†L185-L188】.  This script
 achieves the same effect by never drawing subtitles on top of the video.
+
+Playback and screenshot saving are provided by `_player_core.py`, shared with
+`mkv_player.py`; this script runs the same player without subtitles.
 """
 
 import argparse
 import os
 import sys
-from datetime import datetime
-from typing import Optional
-
-import cv2
-import numpy as np
-
 
+from _player_core import Player
 
 
 def main() -> None:
@@ -86,63 +86,14 @@ def main() -> None:
     if not os.path.exists(video_path):
         print(f"Error: video file '{video_path}' does not exist.")
         sys.exit(1)
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
 
-    # Open video capture
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print(f"Error: could not open video file '{video_path}'.")
+    player = Player(video_path, output_dir=output_dir)
+    try:
+        player.run()
+    except OSError as exc:
+        print(f"Error: {exc}.")
         sys.exit(1)
 
-    # Get frames per second to control playback speed
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if fps <= 0:
-        fps = 25  # default fallback fps
-    delay = int(1000 / fps)
-
-    paused = False
-    current_frame: Optional[np.ndarray] = None
-    window_name = "MKV Player"
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-
-    print("Controls: press 'space' to pause/resume, 's' to take a screenshot, 'q' or Esc to quit.")
-
-    while True:
-        if not paused:
-            ret, frame = cap.read()
-            if not ret:
-                print("End of video.")
-                break
-            current_frame = frame
-        # Use the last read frame if paused
-        if current_frame is None:
-            break
-        display_frame = current_frame.copy()
-        # Nothing to overlay; OpenCV does not render internal subtitles.
-        # Show frame
-        cv2.imshow(window_name, display_frame)
-        # Wait for key press and timing; waitKey returns key code or -1
-        key = cv2.waitKey(delay) & 0xFF
-        if key in (ord('q'), 27):
-            # Quit on 'q' or Escape
-            print("Quitting...")
-            break
-        elif key == ord(' '):
-            paused = not paused
-        elif key == ord('s'):
-            # Save current_frame without subtitles
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-            filename = f"screenshot_{timestamp}.png"
-            filepath = os.path.join(output_dir, filename)
-            cv2.imwrite(filepath, current_frame)
-            print(f"Saved screenshot to {filepath}")
-        # else ignore other keys
-
-    # Cleanup
-    cap.release()
-    cv2.destroyAllWindows()
-
 
 if __name__ == "__main__":
     main()
\ No newline at end of file